@@ -5,8 +5,15 @@ At Risk | Recovery | Conquest
 
 import streamlit as st
 import pandas as pd
+import numpy as np
+from collections import defaultdict
 from datetime import datetime
+import functools
 import json
+import logging
+import queue
+import threading
+import time
 from pathlib import Path
 
 try:
@@ -16,6 +23,14 @@ try:
 except ImportError:
     GSHEETS_AVAILABLE = False
 
+try:
+    import orjson
+    def jdumps(o): return orjson.dumps(o, default=str)
+    jloads = orjson.loads
+except ImportError:
+    def jdumps(o): return json.dumps(o, separators=(',', ':'), default=str).encode()
+    jloads = json.loads
+
 st.set_page_config(page_title="SE Outreach Hub", page_icon="SE", layout="wide",
                    initial_sidebar_state="collapsed")
 
@@ -33,13 +48,21 @@ BRANCHES = {
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets",
           "https://www.googleapis.com/auth/drive"]
 
+GS_RETRIES = 5
+SYNC_DEBOUNCE_S = 2  # queued Sheets edits older than this go out on the next rerun
+POLL_TTL_S = 10      # how stale the shared modifiedTime poll may be
+DELETED = "deleted"  # module column of a delete row in the append-only sheet
+
+LOG_COLS = ["log_key", "customer_name", "branch_name", "called", "followup",
+            "notes", "user", "date_updated", "module", "targeted"]
+
 # =============================================================================
 # GOOGLE SHEETS BACKEND
 # =============================================================================
 
 @st.cache_resource(ttl=300)
 def get_gsheet_connection():
-    if not GSHEETS_AVAILABLE: return None, None
+    if not GSHEETS_AVAILABLE: return None, None, None
     try:
         creds = Credentials.from_service_account_info(
             dict(st.secrets["gcp_service_account"]), scopes=SCOPES)
@@ -58,101 +81,265 @@ def get_gsheet_connection():
             ws = sh.worksheet("call_log")
         except gspread.WorksheetNotFound:
             ws = sh.add_worksheet(title="call_log", rows=5000, cols=10)
-            ws.append_row(["log_key","customer_name","branch_name","called",
-                           "followup","notes","user","date_updated","module","targeted"])
-        return client, sh
+            ws.append_row(LOG_COLS)
+        return client, sh, ws
     except Exception as e:
         st.sidebar.warning(f"Sheets: {e}")
-        return None, None
+        return None, None, None
+
+def sheet_modified_time(sh):
+    try: return sh.get_lastUpdateTime()
+    except Exception: return None
 
-def load_call_log_gsheets(sh):
+def gs_retry(fn):
+    # Retry quota (429) and transient backend errors, backing off 2/4/8/16 s.
+    @functools.wraps(fn)
+    def wrap(*a, **kw):
+        for i in range(GS_RETRIES):
+            try:
+                return fn(*a, **kw)
+            except gspread.exceptions.APIError as e:
+                if i == GS_RETRIES - 1 or e.response.status_code not in (429, 500, 503): raise
+                time.sleep(2 ** (i + 1))
+    return wrap
+
+@gs_retry
+def fetch_call_log_gsheets(ws):
+    # The sheet is append-only: the last row for a key wins, a DELETED row drops it.
+    rows = ws.get("A2:J", value_render_option="UNFORMATTED_VALUE")
+    log = {}
+    for r in rows:
+        if not r or not r[0]: continue
+        r = list(r) + [""] * (len(LOG_COLS) - len(r))
+        key = str(r[0])
+        if r[8] == DELETED:
+            log.pop(key, None); continue
+        log[key] = {
+            "customer_name": str(r[1]),
+            "branch_name":   str(r[2]),
+            "called":   str(r[3]).lower() == "true",
+            "followup": str(r[4]).lower() == "true",
+            "targeted": str(r[9]).lower() == "true",
+            "notes": str(r[5]),
+            "user":  str(r[6]),
+            "date_updated": str(r[7]),
+        }
+    return log, len(rows)
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def call_log_snapshot(_ws, modified):
+    # Keyed on the sheet's modifiedTime: sessions opened between edits share one
+    # fetch. Only the latest snapshot is ever asked for, so older ones are evicted.
+    return fetch_call_log_gsheets(_ws)
+
+@st.cache_data(ttl=POLL_TTL_S, show_spinner=False)
+def polled_modified_time(_sh):
+    # Metadata-only check shared by all sessions, at most one Drive call per 10 s.
+    return sheet_modified_time(_sh)
+
+def load_call_log_gsheets(sh, ws, modified=None):
+    modified = modified or sheet_modified_time(sh)
     try:
-        records = sh.worksheet("call_log").get_all_records()
-        log = {}
-        for r in records:
-            key = r.get("log_key", "")
-            if not key: continue
-            log[key] = {
-                "customer_name": r.get("customer_name", ""),
-                "branch_name":   r.get("branch_name", ""),
-                "called":   str(r.get("called",   "")).lower() == "true",
-                "followup": str(r.get("followup", "")).lower() == "true",
-                "targeted": str(r.get("targeted", "")).lower() == "true",
-                "notes": r.get("notes", ""),
-                "user":  r.get("user", ""),
-                "date_updated": r.get("date_updated", ""),
-            }
-        return log
+        log, n_rows = (call_log_snapshot(ws, modified) if modified
+                       else fetch_call_log_gsheets(ws))
     except Exception:
-        return {}
-
-def save_entry_gsheets(sh, log_key, entry):
+        return None
+    st.session_state._sheet_rows = n_rows
+    st.session_state._log_modified = modified
+    return log
+
+def log_row(log_key, entry):
+    return [log_key,
+            entry.get("customer_name",""), entry.get("branch_name",""),
+            str(entry.get("called", False)), str(entry.get("followup", False)),
+            entry.get("notes",""), entry.get("user",""),
+            entry.get("date_updated",""), log_key.split("_")[0],
+            str(entry.get("targeted", False))]
+
+def save_entry_gsheets(log_key, entry):
+    # Queued (with edit time) for flush_pending_gsheets(); only the latest row per key is kept.
+    st.session_state._pending_writes[log_key] = (log_row(log_key, entry), time.time())
+
+def delete_entry_gsheets(log_key):
+    tomb = [log_key, "", "", "", "", "", st.session_state.get("user_name", ""),
+            datetime.now().strftime("%Y-%m-%d %H:%M"), DELETED, ""]
+    st.session_state._pending_writes[log_key] = (tomb, time.time())
+
+def flush_pending_gsheets(ws, min_age=0):
+    # values.append only: no row numbers to go stale when another session writes.
+    cutoff = time.time() - min_age
+    pending = st.session_state._pending_writes
+    due = [k for k, (_, ts) in pending.items() if ts <= cutoff]
+    if not due: return
     try:
-        ws = sh.worksheet("call_log")
-        module = log_key.split("_")[0]
-        row_data = [log_key,
-                    entry.get("customer_name",""), entry.get("branch_name",""),
-                    str(entry.get("called", False)), str(entry.get("followup", False)),
-                    entry.get("notes",""), entry.get("user",""),
-                    entry.get("date_updated",""), module,
-                    str(entry.get("targeted", False))]
-        try:
-            cell = ws.find(log_key, in_column=1)
-            if cell:
-                ws.update(f"A{cell.row}:J{cell.row}", [row_data]); return
-        except gspread.exceptions.CellNotFound:
-            pass
-        ws.append_row(row_data, value_input_option="RAW")
+        gs_retry(ws.append_rows)([pending[k][0] for k in due],
+                                 value_input_option="RAW", insert_data_option="INSERT_ROWS")
+        for k in due: del pending[k]
+        st.session_state._sheet_rows += len(due)
+        st.session_state._last_flush = time.time()
     except Exception as e:
-        st.toast(f"Save error: {e}", icon="warning")
-
-def delete_entry_gsheets(sh, log_key):
+        st.toast(f"Save error: {e}", icon="warning"); return
+    # Same bound as the local op log: rewrite once superseded rows dominate. Only
+    # with nothing left queued, since the compacted log replaces the session's copy.
+    if not pending and st.session_state._sheet_rows > 4 * max(len(st.session_state.call_log), 64):
+        log = compact_call_log_gsheets(ws)
+        if log is not None: st.session_state.call_log = log
+
+@st.cache_resource
+def compact_lock():
+    # Two overlapping compactions would delete each other's tail ranges.
+    return threading.Lock()
+
+def compact_call_log_gsheets(ws):
+    # Rewrites the rows read as one row per live key and drops only the leftover
+    # tail of that range; rows other sessions append meanwhile sit below it and
+    # just move up, still after the compacted rows they supersede.
+    lock = compact_lock()
+    if not lock.acquire(blocking=False): return None
     try:
-        ws = sh.worksheet("call_log")
-        cell = ws.find(log_key, in_column=1)
-        if cell: ws.delete_rows(cell.row)
-    except Exception:
-        pass
+        log, n_read = fetch_call_log_gsheets(ws)
+        rows = [log_row(k, e) for k, e in log.items()]
+        if rows: gs_retry(ws.update)(range_name=f"A2:J{len(rows) + 1}", values=rows,
+                                     value_input_option="RAW")
+        if n_read > len(rows): gs_retry(ws.delete_rows)(len(rows) + 2, n_read + 1)
+        st.session_state._sheet_rows = len(rows)
+        st.session_state._last_flush = time.time()
+        return log
+    except Exception as e:
+        st.toast(f"Compact error: {e}", icon="warning")
+    finally:
+        lock.release()
 
-CALL_LOG_FILE = APP_DIR / "call_log.json"
+CALL_LOG_FILE = APP_DIR / "call_log.json"    # compacted snapshot
+CALL_LOG_WAL  = APP_DIR / "call_log.jsonl"   # put/del ops appended since the snapshot
 
 def load_call_log_local():
+    log = {}
     if CALL_LOG_FILE.exists():
         try:
-            with open(CALL_LOG_FILE, 'r') as f: return json.load(f)
-        except: return {}
-    return {}
+            with open(CALL_LOG_FILE, 'rb') as f: log = jloads(f.read())
+        except: log = {}
+    n = 0
+    if CALL_LOG_WAL.exists():
+        with open(CALL_LOG_WAL, 'rb') as f:
+            for line in f:
+                try: op = jloads(line)
+                except ValueError: continue  # torn last line from a crash mid-write
+                n += 1
+                if op.get('op') == 'del': log.pop(op['k'], None)
+                else: log[op['k']] = op['v']
+    st.session_state._wal_lines = n
+    return log
+
+@st.cache_resource
+def local_log_writer():
+    # One writer thread per server process; batches whatever lands within 100 ms.
+    q = queue.Queue()
+    def drain():
+        while True:
+            batch = [q.get()]
+            try:
+                while len(batch) < 256: batch.append(q.get(timeout=0.1))
+            except queue.Empty:
+                pass
+            try:
+                with open(CALL_LOG_WAL, 'ab') as f:
+                    f.write(b''.join(batch)); f.flush()
+            except OSError as e:
+                # Keep draining so join() can't hang; the session's in-memory log
+                # still holds these ops and the next compaction snapshots them.
+                logging.getLogger(__name__).warning("call log write failed: %s", e)
+            finally:
+                for _ in batch: q.task_done()
+    threading.Thread(target=drain, name="call-log-writer", daemon=True).start()
+    return q
 
 def save_call_log_local(log):
-    with open(CALL_LOG_FILE, 'w') as f:
-        json.dump(log, f, indent=2, default=str)
+    local_log_writer().join()  # queued ops must hit the WAL before it is truncated
+    tmp = CALL_LOG_FILE.with_suffix('.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(jdumps(log))
+    tmp.replace(CALL_LOG_FILE)
+    CALL_LOG_WAL.unlink(missing_ok=True)
+    st.session_state._wal_lines = 0
+
+def append_call_log_local(op):
+    local_log_writer().put(jdumps(op) + b"\n")
+    st.session_state._wal_lines = st.session_state.get('_wal_lines', 0) + 1
+    log = st.session_state.call_log
+    if st.session_state._wal_lines > 4 * max(len(log), 64):
+        save_call_log_local(log)
 
 def init_call_log():
     if "call_log" not in st.session_state or st.session_state.call_log is None:
-        _, sh = get_gsheet_connection()
-        if sh:
-            st.session_state.call_log = load_call_log_gsheets(sh)
+        _, sh, ws = get_gsheet_connection()
+        if ws:
+            st.session_state.call_log = load_call_log_gsheets(sh, ws) or {}
             st.session_state.gsheets_active = True
         else:
             st.session_state.call_log = load_call_log_local()
             st.session_state.gsheets_active = False
 
+def refresh_log():
+    # Reload only when the sheet changed since our snapshot; never over unsent edits.
+    if not st.session_state.get("gsheets_active"): return
+    if st.session_state._pending_writes: return
+    # A poll cached before our last flush names a snapshot without our writes;
+    # loading it would roll back what we just saved.
+    if time.time() - st.session_state._last_flush < POLL_TTL_S: return
+    _, sh, ws = get_gsheet_connection()
+    if not ws: return
+    modified = polled_modified_time(sh)
+    if modified and modified != st.session_state._log_modified:
+        log = load_call_log_gsheets(sh, ws, modified)
+        if log is not None: st.session_state.call_log = log
+
+ADMIN_COLS = {'key': 'key', 'customer_name': 'customer', 'branch_name': 'branch',
+              'targeted': 'targeted', 'called': 'called', 'followup': 'followup', 'notes': 'notes',
+              'user': 'user', 'date_updated': 'date'}
+ADMIN_DEFAULTS = {'customer_name': '', 'branch_name': '', 'targeted': False, 'called': False,
+                  'followup': False, 'notes': '', 'user': '', 'date_updated': ''}
+
+LOG_CATS = ['campaign', 'branch_name', 'user']
+
+def call_log_df():
+    # Columnar mirror of call_log for the admin page. Rebuilt only after the log
+    # changed (save/delete bump _log_rev; reloads swap in a new dict).
+    log, rev = st.session_state.call_log or {}, st.session_state._log_rev
+    m = st.session_state._log_df
+    if m and m[0] is log and m[1] == rev: return m[2]
+    cols = {'key': list(log)}
+    for c, d in ADMIN_DEFAULTS.items():  # defaults filled per column: no object fillna downcast
+        cols[c] = [d if v.get(c) is None else v[c] for v in log.values()]
+    df = pd.DataFrame(cols)
+    df.insert(1, 'campaign', df['key'].str.partition('_')[0])
+    df = df.astype({c: 'category' for c in LOG_CATS})
+    st.session_state._log_df = (log, rev, df)
+    return df
+
 def save_entry(log_key, entry):
     st.session_state.call_log[log_key] = entry
+    st.session_state._log_rev += 1
     if st.session_state.get("gsheets_active"):
-        _, sh = get_gsheet_connection()
-        if sh: save_entry_gsheets(sh, log_key, entry)
+        _, _, ws = get_gsheet_connection()
+        if ws: save_entry_gsheets(log_key, entry)
     else:
-        save_call_log_local(st.session_state.call_log)
+        append_call_log_local({'op': 'put', 'k': log_key, 'v': entry})
 
 def delete_entry(log_key):
     if log_key in st.session_state.call_log:
         del st.session_state.call_log[log_key]
+        st.session_state._log_rev += 1
     if st.session_state.get("gsheets_active"):
-        _, sh = get_gsheet_connection()
-        if sh: delete_entry_gsheets(sh, log_key)
+        _, _, ws = get_gsheet_connection()
+        if ws: delete_entry_gsheets(log_key)
     else:
-        save_call_log_local(st.session_state.call_log)
+        append_call_log_local({'op': 'del', 'k': log_key})
+
+def flush_pending(min_age=0):
+    if not st.session_state.get("gsheets_active"): return
+    _, _, ws = get_gsheet_connection()
+    if ws: flush_pending_gsheets(ws, min_age)
 
 # =============================================================================
 # CSS
@@ -184,11 +371,6 @@ st.markdown(f"""
     .cval  {{font-size:12px;color:#475569;}}
     .divider {{border-bottom:1px solid #f1f5f9;margin:4px 0;}}
     .tgt-bg {{background:#FFFBEB;border-left:3px solid #D97706;padding-left:6px;border-radius:2px;}}
-    .badge {{display:inline-block;padding:1px 7px;border-radius:10px;font-size:10px;font-weight:600;}}
-    .b-hot  {{background:#FEE2E2;color:#991B1B;}}
-    .b-warm {{background:#FEF3C7;color:#92400E;}}
-    .b-cool {{background:#DBEAFE;color:#1E40AF;}}
-    .b-gray {{background:#F3F4F6;color:#374151;}}
     .gs-on  {{font-size:11px;background:#ECFDF5;color:#065F46;padding:2px 8px;border-radius:10px;}}
     .gs-off {{font-size:11px;background:#FEF2F2;color:#991B1B;padding:2px 8px;border-radius:10px;}}
     .stButton>button {{background:{SE_MAROON};color:white;border:none;font-weight:500;}}
@@ -200,20 +382,144 @@ st.markdown(f"""
 # DATA LOADERS
 # =============================================================================
 
-@st.cache_data
-def load_at_risk():
-    try: return pd.read_csv(APP_DIR / "data_at_risk.csv")
+# Arrow parser (ships with streamlit); low-cardinality columns as categoricals.
+# Frames come back pre-sorted by each page's static order, so pages only need a
+# stable sort on the per-session _tg/_cd flag.
+BRANCH_DTYPE = {'branch': 'category'}
+TIER_DTYPE   = pd.CategoricalDtype([1, 2, 3, 4], ordered=True)  # keeps tier <= 2 filters
+
+# Money/month columns fit float32 and the counts fit small ints; halves the
+# cached frames and the bytes every sum/sort/filter has to touch.
+NUM_FLOATS = ('decline_amount', 'months_gone', 'rev_2025', 'rev_2024', 'rev_2023',
+              'equip_value', 'hist_revenue')
+NUM_INTS   = ('txn_count', 'units', 'score', 'machines_serviced')
+
+def downcast(df):
+    for c in NUM_FLOATS:
+        if c in df.columns: df[c] = pd.to_numeric(df[c], errors='coerce', downcast='float')
+    for c in NUM_INTS:
+        if c in df.columns: df[c] = pd.to_numeric(df[c], errors='coerce', downcast='integer')
+    return df
+
+def customer_display(df):
+    # At Risk / Recovery display strings, formatted once per load instead of per row.
+    return df.assign(
+        _name=df['customer'].astype(str).str.strip(),
+        _acct=df['acct'].map(fmt_acct), _lp=df['last_purchase'].map(fmt_date),
+        _dec=df['decline_amount'].map(fmt_rev), _r24=df['rev_2024'].map(fmt_rev),
+        _mo=df['months_gone'].map(fmt_mo))
+
+def with_search_col(df, col):
+    # Lowercased (and unpadded) once here so search filters don't redo it per
+    # keystroke; Arrow strings keep the substring scan in C.
+    return df.assign(_name_l=df[col].str.strip().str.lower().astype('string[pyarrow]'))
+
+@st.cache_data(show_spinner=False)
+def load_at_risk(mtime):
+    try: df = pd.read_csv(APP_DIR / "data_at_risk.csv", engine="pyarrow", dtype=BRANCH_DTYPE)
     except: return pd.DataFrame()
+    df = downcast(df).sort_values('months_gone', kind='stable')
+    return with_search_col(customer_display(df), 'customer')
 
-@st.cache_data
-def load_recovery():
-    try: return pd.read_csv(APP_DIR / "data_recovery_lost.csv")
+@st.cache_data(show_spinner=False)
+def load_recovery(mtime):
+    try: df = pd.read_csv(APP_DIR / "data_recovery_lost.csv", engine="pyarrow", dtype=BRANCH_DTYPE)
+    except: return pd.DataFrame()
+    df = downcast(df).sort_values('decline_amount', ascending=False, kind='stable')
+    return with_search_col(customer_display(df), 'customer')
+
+def conquest_display(df):
+    # Display strings for the conquest rows, built column-wise once at load.
+    # The Arrow parser reads blank cells as None/NA rather than the C parser's 'nan'.
+    def txt(c): return df[c].astype(object).fillna('').astype(str).str.strip()
+    makes = txt('makes').mask(lambda x: x.eq('nan'), '')
+    units = df['units'].fillna(0).astype(int).astype(str) + ' units'
+    ph    = txt('phone')
+    ph    = ph.where((ph.str.len() >= 7) & ~ph.isin(['nan', '0', '0.0']), '')
+    ct    = txt('contact').mask(lambda x: x.isin(['nan nan', 'nan']), '')
+    city, state = txt('city'), txt('state')
+    loc   = (city + ', ' + state).where(~city.isin(['', 'nan']) & ~state.isin(['', 'nan']), '')
+    # First two non-empty of contact / phone / location
+    one   = ct + ph  # at most one is non-empty unless both are
+    sub   = (one + ' | ' + loc).where(one.ne('') & loc.ne(''), one + loc)
+    sub   = (ct + ' | ' + ph).where(ct.ne('') & ph.ne(''), sub)
+    hr    = pd.to_numeric(df['hist_revenue'], errors='coerce')
+    tier  = df['tier'].astype(object)  # plain values so unmapped tiers can take the default
+    return df.assign(
+        _name=txt('company'),
+        _tier_lbl=tier.map(TIER_LABELS).fillna('T4'),
+        _score=pd.to_numeric(df['score'], errors='coerce').fillna(0).astype(int),
+        _equip=(makes + ' · ' + units).where(makes.ne(''), units),
+        _loc=loc, _sub=sub,
+        _se_h=hr.map('${:,.0f}'.format).where(hr > 0, '—'))
+
+@st.cache_data(show_spinner=False)
+def load_conquest(mtime):
+    try: df = pd.read_csv(APP_DIR / "data_conquest.csv", engine="pyarrow", dtype={**BRANCH_DTYPE, 'state': 'category'})
     except: return pd.DataFrame()
+    df = downcast(df)
+    df['tier'] = df['tier'].astype(TIER_DTYPE)
+    df = df.sort_values(['tier', 'score'], ascending=[True, False], kind='stable')
+    return with_search_col(conquest_display(df), 'company')
+
+# Loaders take the CSV's mtime (file_mtime) as their cache key, so a replaced file is re-read.
+LOADERS = {'atrisk': load_at_risk, 'recovery': load_recovery, 'conquest': load_conquest}
+
+# Cards page only needs counts, so it reads a few columns instead of whole files.
+CAMPAIGN_FILES = {'atrisk': "data_at_risk.csv", 'recovery': "data_recovery_lost.csv",
+                  'conquest': "data_conquest.csv"}
+CARD_COLS = {'atrisk':   ['branch', 'customer', 'months_gone'],
+             'recovery': ['branch', 'customer'],
+             'conquest': ['branch', 'company', 'tier']}
+
+def file_mtime(campaign):
+    try: return (APP_DIR / CAMPAIGN_FILES[campaign]).stat().st_mtime
+    except OSError: return 0
 
 @st.cache_data
-def load_conquest():
-    try: return pd.read_csv(APP_DIR / "data_conquest.csv")
+def load_card_cols(campaign, mtime):
+    try: df = pd.read_csv(APP_DIR / CAMPAIGN_FILES[campaign], engine="pyarrow",
+                          usecols=CARD_COLS[campaign], dtype=BRANCH_DTYPE)
     except: return pd.DataFrame()
+    if 'tier' in df.columns: df['tier'] = df['tier'].astype(TIER_DTYPE)
+    return downcast(df)
+
+@st.cache_data
+def card_slice(campaign, branch, mtime):
+    df = load_card_cols(campaign, mtime)
+    if df.empty: return df
+    return df[df['branch'] == branch]
+
+@st.cache_data
+def branch_counts(campaign, mtime):
+    # {branch: rows} for every branch at once: one hash pass instead of a mask per branch.
+    df = load_card_cols(campaign, mtime)
+    if df.empty: return {'all': {}, 'sub': {}}
+    if campaign == 'atrisk':     sub = df[df['months_gone'] < 7]
+    elif campaign == 'conquest': sub = df[df['tier'] <= 2]
+    else:                        sub = df.iloc[:0]
+    return {'all': df['branch'].value_counts().to_dict(),
+            'sub': sub['branch'].value_counts().to_dict()}
+
+def campaign_totals(branch, mtimes):
+    # Scalar card counts for one branch, read out of the per-campaign branch counts.
+    ar, rec, cq = (branch_counts(c, m) for c, m in zip(('atrisk', 'recovery', 'conquest'), mtimes))
+    return {'atrisk': ar['all'].get(branch, 0), 'recovery': rec['all'].get(branch, 0),
+            'conquest': cq['all'].get(branch, 0),
+            'urgent': ar['sub'].get(branch, 0), 't12': cq['sub'].get(branch, 0)}
+
+@st.cache_data
+def branch_slice(campaign, branch, mtime):
+    # Per (campaign, branch) so reruns skip the full-frame boolean mask.
+    df = LOADERS[campaign](mtime)
+    if df.empty or 'branch' not in df.columns: return pd.DataFrame()
+    return df[df['branch'] == branch]
+
+@st.cache_data
+def campaign_branches(campaign, mtime):
+    df = LOADERS[campaign](mtime)
+    if df.empty or 'branch' not in df.columns: return []
+    return sorted(df['branch'].dropna().unique().tolist())
 
 # =============================================================================
 # HELPERS
@@ -221,7 +527,7 @@ def load_conquest():
 
 def gbn(): return BRANCHES.get(st.session_state.get('branch'), 'Unknown')
 def gun(): return st.session_state.get('user_name', '')
-def go(p): st.session_state.page = p
+def go(p): flush_pending(); st.session_state.page = p
 
 def gs_badge():
     if st.session_state.get('gsheets_active'):
@@ -234,11 +540,6 @@ def hbar(title, right=''):
         f'<span class="hbar-info">{right} {gun()} {gs_badge()}</span></div>',
         unsafe_allow_html=True)
 
-def col_heads(ws, labels):
-    cols = st.columns(ws)
-    for i, l in enumerate(labels):
-        cols[i].markdown(f'<div class="col-hdr">{l}</div>', unsafe_allow_html=True)
-
 def fmt_rev(v):
     try:
         f = float(v)
@@ -250,21 +551,49 @@ def fmt_mo(v):
     try: return f"{float(v):.1f}"
     except: return "—"
 
-def n_targeted(df, id_col, prefix, log):
-    if df.empty or id_col not in df.columns: return 0
-    return sum(1 for _, r in df.iterrows()
-               if log.get(f"{prefix}_{r[id_col]}", {}).get('targeted'))
-
-def n_called(df, id_col, prefix, log):
-    if df.empty or id_col not in df.columns: return 0
-    return sum(1 for _, r in df.iterrows()
-               if log.get(f"{prefix}_{r[id_col]}", {}).get('called'))
-
-def target_toggle(lk, currently, cname, dbr):
+def fmt_acct(v): return str(v).split('.')[0] if pd.notna(v) else ''
+def fmt_date(v): return str(v)[:10] if pd.notna(v) else ''
+
+def with_flags(df, id_col, prefix, log):
+    # One pass over the log for both flags; keys are written with the stripped id.
+    p = f"{prefix}_"; n = len(p); tg, cd = set(), set()
+    for k, v in log.items():
+        if not k.startswith(p): continue
+        if v.get('targeted'): tg.add(k[n:])
+        if v.get('called'):   cd.add(k[n:])
+    # id_col must already be stripped strings (the loaders' _name); assign() adds
+    # the two flag columns without copying the slice first.
+    ids = df[id_col]
+    return df.assign(_tg=ids.isin(tg), _cd=ids.isin(cd))
+
+def bucket_log(log):
+    # One pass over the log -> {prefix: {id: entry}}
+    buckets = defaultdict(dict)
+    for k, v in log.items():
+        p, _, i = k.partition('_'); buckets[p][i] = v
+    return buckets
+
+def flag_counts(df, id_col, entries):
+    # (targeted, called) for one campaign's bucket of the log
+    if df.empty or id_col not in df.columns or not entries: return 0, 0
+    tg = {i for i, v in entries.items() if v.get('targeted')}
+    cd = {i for i, v in entries.items() if v.get('called')}
+    ids = df[id_col].astype(str).str.strip()
+    return int(ids.isin(tg).sum()), int(ids.isin(cd).sum())
+
+def flagged_first(df, flag, n):
+    # First n rows with flagged ones on top, without sorting the whole frame;
+    # order within each group is the loader's pre-sort.
+    m   = df[flag].to_numpy(dtype=bool)
+    idx = np.flatnonzero(m)[:n]
+    idx = np.concatenate([idx, np.flatnonzero(~m)[:n - len(idx)]])
+    return df.iloc[idx]
+
+def target_toggle(lk, currently, cname, dbr, now):
     if currently:
         e = st.session_state.call_log.get(lk, {})
         e.update({'targeted': True, 'customer_name': cname, 'branch_name': dbr,
-                  'user': gun(), 'date_updated': datetime.now().strftime('%Y-%m-%d %H:%M')})
+                  'user': gun(), 'date_updated': now})
         save_entry(lk, e)
     else:
         e = st.session_state.call_log.get(lk, {})
@@ -277,25 +606,93 @@ def target_toggle(lk, currently, cname, dbr):
 def back_btn(dest, key):
     if st.button("Back", key=key): go(dest); st.rerun()
 
+def sync_btn(key):
+    n = len(st.session_state._pending_writes)
+    if n and st.button(f"Sync ({n})", key=key): flush_pending(); st.rerun()
+
+def target_editor(view, ids, prefix, dbr, key):
+    # Browse pages: one data_editor with a Select column instead of a checkbox row per customer.
+    log  = st.session_state.call_log
+    base = pd.DataFrame({'Select': [bool(log.get(f"{prefix}_{i}", {}).get('targeted')) for i in ids]})
+    base = pd.concat([base, view.reset_index(drop=True)], axis=1)
+    edited = st.data_editor(
+        base, key=f"{key}_{st.session_state._editor_rev}", hide_index=True,
+        use_container_width=True, disabled=list(view.columns),
+        column_config={'Select': st.column_config.CheckboxColumn('Select', width='small')})
+
+    changed = edited['Select'] != base['Select']
+    if not changed.any(): return
+    now = datetime.now().strftime('%Y-%m-%d %H:%M')  # one stamp for the whole batch
+    for i in changed[changed].index:
+        target_toggle(f"{prefix}_{ids[i]}", bool(edited.at[i, 'Select']), ids[i], dbr, now)
+    st.session_state._editor_rev += 1
+    st.rerun()
+
+def call_editor(view, ids, prefix, dbr, key):
+    # One data_editor per target list instead of two checkboxes + a text input per row.
+    log  = st.session_state.call_log
+    ents = [log.get(f"{prefix}_{i}", {}) for i in ids]
+    base = pd.DataFrame({'Called': [bool(e.get('called'))   for e in ents],
+                         'F/U':    [bool(e.get('followup')) for e in ents]})
+    base = pd.concat([base, view.reset_index(drop=True)], axis=1)
+    base['Notes'] = [e.get('notes', '') for e in ents]
+
+    # Edits are stored positionally under the widget key; a fresh key after each
+    # save keeps them from replaying onto re-sorted rows.
+    edited = st.data_editor(
+        base, key=f"{key}_{st.session_state._editor_rev}", hide_index=True,
+        use_container_width=True, disabled=list(view.columns),
+        column_config={'Called': st.column_config.CheckboxColumn('Called', width='small'),
+                       'F/U':    st.column_config.CheckboxColumn('F/U', width='small'),
+                       'Notes':  st.column_config.TextColumn('Notes', width='large')})
+
+    ec = ['Called', 'F/U', 'Notes']
+    changed = (edited[ec] != base[ec]).any(axis=1)
+    if not changed.any(): return
+    now = datetime.now().strftime('%Y-%m-%d %H:%M')
+    for i in changed[changed].index:
+        lk = f"{prefix}_{ids[i]}"
+        e  = log.get(lk, {})
+        e.update({'called': bool(edited.at[i, 'Called']), 'followup': bool(edited.at[i, 'F/U']),
+                  'notes': edited.at[i, 'Notes'] or '', 'targeted': True,
+                  'customer_name': ids[i], 'branch_name': dbr,
+                  'user': gun(), 'date_updated': now})
+        save_entry(lk, e)
+    st.session_state._editor_rev += 1
+    st.rerun()
+
 # =============================================================================
 # STATE INIT
 # =============================================================================
 
 for key, default in [('page','login'), ('branch', None), ('user_name', ''),
-                     ('call_log', None), ('gsheets_active', False)]:
+                     ('call_log', None), ('gsheets_active', False),
+                     ('_sheet_rows', 0), ('_pending_writes', {}), ('_last_flush', 0),
+                     ('_editor_rev', 0), ('_log_rev', 0), ('_log_df', None),
+                     ('_log_modified', None)]:
     if key not in st.session_state:
         st.session_state[key] = default
 
+@st.fragment(run_every=SYNC_DEBOUNCE_S)
+def autosync():
+    # Editors rerun right after saving, so the newest edit is always too young for
+    # the flush above; this timer sends it even if the user never interacts again.
+    flush_pending(min_age=SYNC_DEBOUNCE_S)
+
 init_call_log()
+flush_pending(min_age=SYNC_DEBOUNCE_S)
+refresh_log()
+if st.session_state.gsheets_active: autosync()
 
 # =============================================================================
 # LOGIN
 # =============================================================================
 
 def show_login():
-    st.markdown('<div class="login-wrap">', unsafe_allow_html=True)
-    st.markdown('<div class="login-title">Southeastern Equipment</div>', unsafe_allow_html=True)
-    st.markdown('<div class="login-sub">Customer Outreach Hub</div>', unsafe_allow_html=True)
+    # One element: a markdown call can't wrap later ones, so the header is a single blob.
+    st.markdown('<div class="login-wrap">'
+                '<div class="login-title">Southeastern Equipment</div>'
+                '<div class="login-sub">Customer Outreach Hub</div></div>', unsafe_allow_html=True)
 
     c1, c2, c3 = st.columns([1, 1.2, 1])
     with c2:
@@ -315,59 +712,13 @@ def show_login():
                 st.session_state.branch = br_id
                 go('cards')
                 st.rerun()
-    st.markdown('</div>', unsafe_allow_html=True)
 
 # =============================================================================
 # CARDS
 # =============================================================================
 
-def show_cards():
-    branch = gbn()
-    log    = st.session_state.call_log
-
-    ar  = load_at_risk()
-    rec = load_recovery()
-    cq  = load_conquest()
-
-    def bf(df, col, val):
-        return df[df[col] == val].copy() if col in df.columns and not df.empty else pd.DataFrame()
-
-    arb  = bf(ar,  'branch', branch)
-    recb = bf(rec, 'branch', branch)
-    cqb  = bf(cq,  'branch', branch)
-
-    ar_tg  = n_targeted(arb,  'customer', 'atrisk',   log)
-    ar_cd  = n_called(arb,    'customer', 'atrisk',   log)
-    rec_tg = n_targeted(recb, 'customer', 'recovery', log)
-    rec_cd = n_called(recb,   'customer', 'recovery', log)
-    cq_tg  = n_targeted(cqb,  'company',  'conquest', log)
-    cq_cd  = n_called(cqb,    'company',  'conquest', log)
-
-    hbar("Customer Outreach Hub", f"{branch} |")
-
-    st.markdown(
-        f'<p style="color:#64748b;font-size:13px;margin-bottom:18px;">'
-        f'Welcome, {gun()}. Select a list to get started.</p>',
-        unsafe_allow_html=True)
-
-    urgent_ct = len(arb[arb['months_gone'] < 7]) if not arb.empty and 'months_gone' in arb.columns else 0
-    t12_ct    = len(cqb[cqb['tier'] <= 2]) if not cqb.empty and 'tier' in cqb.columns else 0
-
-    modules = [
-        dict(key='atrisk',   title='At Risk',  color='#D97706', bg='#FFFBEB', bar='#FDE68A',
-             total=len(arb),  tg=ar_tg,  cd=ar_cd,
-             sub=f"{urgent_ct} urgent (under 7 mo)" if urgent_ct else "6–12 months inactive",
-             browse='atrisk', lst='atrisk_list'),
-        dict(key='recovery', title='Recovery', color='#DC2626', bg='#FEF2F2', bar='#FECACA',
-             total=len(recb), tg=rec_tg, cd=rec_cd,
-             sub="Lost 13–30 months",
-             browse='recovery', lst='recovery_list'),
-        dict(key='conquest', title='Conquest', color='#7C3AED', bg='#F5F3FF', bar='#DDD6FE',
-             total=len(cqb),  tg=cq_tg,  cd=cq_cd,
-             sub=f"{t12_ct} priority leads (Tier 1 & 2)" if t12_ct else "New prospects",
-             browse='conquest', lst='conquest_list'),
-    ]
-
+@st.fragment
+def card_grid(modules):
     cols = st.columns(3)
     for i, m in enumerate(modules):
         with cols[i]:
@@ -401,6 +752,47 @@ def show_cards():
                     style="width:{pct}%;background:{m['color']};"></div></div>
             </div>""", unsafe_allow_html=True)
 
+def show_cards():
+    branch = gbn()
+    log    = st.session_state.call_log
+
+    mt   = tuple(file_mtime(c) for c in ('atrisk', 'recovery', 'conquest'))
+    arb  = card_slice('atrisk',   branch, mt[0])
+    recb = card_slice('recovery', branch, mt[1])
+    cqb  = card_slice('conquest', branch, mt[2])
+    tot  = campaign_totals(branch, mt)
+
+    bk = bucket_log(log)
+    ar_tg,  ar_cd  = flag_counts(arb,  'customer', bk['atrisk'])
+    rec_tg, rec_cd = flag_counts(recb, 'customer', bk['recovery'])
+    cq_tg,  cq_cd  = flag_counts(cqb,  'company',  bk['conquest'])
+
+    hbar("Customer Outreach Hub", f"{branch} |")
+
+    st.markdown(
+        f'<p style="color:#64748b;font-size:13px;margin-bottom:18px;">'
+        f'Welcome, {gun()}. Select a list to get started.</p>',
+        unsafe_allow_html=True)
+
+    urgent_ct, t12_ct = tot['urgent'], tot['t12']
+
+    modules = [
+        dict(key='atrisk',   title='At Risk',  color='#D97706', bg='#FFFBEB', bar='#FDE68A',
+             total=tot['atrisk'],  tg=ar_tg,  cd=ar_cd,
+             sub=f"{urgent_ct} urgent (under 7 mo)" if urgent_ct else "6–12 months inactive",
+             browse='atrisk', lst='atrisk_list'),
+        dict(key='recovery', title='Recovery', color='#DC2626', bg='#FEF2F2', bar='#FECACA',
+             total=tot['recovery'], tg=rec_tg, cd=rec_cd,
+             sub="Lost 13–30 months",
+             browse='recovery', lst='recovery_list'),
+        dict(key='conquest', title='Conquest', color='#7C3AED', bg='#F5F3FF', bar='#DDD6FE',
+             total=tot['conquest'],  tg=cq_tg,  cd=cq_cd,
+             sub=f"{t12_ct} priority leads (Tier 1 & 2)" if t12_ct else "New prospects",
+             browse='conquest', lst='conquest_list'),
+    ]
+
+    card_grid(modules)
+
     st.markdown("<br>", unsafe_allow_html=True)
     _, c2, _ = st.columns([1, 1, 1])
     with c2:
@@ -417,27 +809,22 @@ def show_cards():
 # TIER LABELS (Conquest)
 # =============================================================================
 
-TIER_LABELS = {
-    1: ('Tier 1', 'b-hot'),
-    2: ('Tier 2', 'b-warm'),
-    3: ('Tier 3', 'b-cool'),
-    4: ('Tier 4', 'b-gray'),
-}
+TIER_LABELS = {1: 'Tier 1', 2: 'Tier 2', 3: 'Tier 3', 4: 'Tier 4'}
 
 # =============================================================================
 # AT RISK — BROWSE
 # =============================================================================
 
 def show_atrisk_browse():
-    df = load_at_risk()
-    if df.empty:
+    branches = campaign_branches('atrisk', file_mtime('atrisk'))
+    if not branches:
         st.error("No at risk data."); back_btn('cards', 'back_ar_empty'); return
 
     dbr = gbn(); log = st.session_state.call_log
 
     c1, c2, c3, c4 = st.columns([2, 2, 2.5, 0.8])
     with c1:
-        opts = ["All Branches"] + sorted(df['branch'].dropna().unique().tolist())
+        opts = ["All Branches"] + branches
         sel  = st.selectbox("Branch", opts, index=opts.index(dbr) if dbr in opts else 0,
                              key="br_ar", label_visibility="collapsed")
         if sel != "All Branches": dbr = sel
@@ -450,16 +837,15 @@ def show_atrisk_browse():
     with c4:
         back_btn('cards', 'back_ar')
 
-    f = df[df['branch'] == dbr].copy()
+    br_all = branch_slice('atrisk', dbr, file_mtime('atrisk'))
+    f = br_all
     if filt == "Urgent (<7 mo)":  f = f[f['months_gone'] < 7]
     elif filt == "7–12 months":   f = f[f['months_gone'] >= 7]
-    if search: f = f[f['customer'].str.contains(search, case=False, na=False)]
+    if search: f = f[f['_name_l'].str.contains(search.lower(), na=False, regex=False)]
 
-    f['_tg'] = f['customer'].apply(lambda x: log.get(f"atrisk_{x}", {}).get('targeted', False))
-    f = f.sort_values(['_tg', 'months_gone'], ascending=[False, True])
+    f = with_flags(f, '_name', 'atrisk', log)
 
     tg_ct   = int(f['_tg'].sum())
-    br_all  = df[df['branch'] == dbr]
     urgent  = len(br_all[br_all['months_gone'] < 7])
 
     hbar("At Risk — Browse", f"{dbr} |")
@@ -478,54 +864,36 @@ def show_atrisk_browse():
         if st.button(lbl, use_container_width=True,
                      type="primary" if tg_ct > 0 else "secondary", key="goto_ar_list"):
             go('atrisk_list'); st.rerun()
+        sync_btn('sync_ar_browse')
 
     st.caption(f"{len(f)} shown")
-    WS = [0.4, 2.8, 1.3, 1.1, 1.3]
-    col_heads(WS, ['SELECT', 'CUSTOMER', '3-YR REVENUE', 'MONTHS INACTIVE', 'LAST PURCHASE'])
-
-    for _, r in f.head(150).iterrows():
-        cid  = str(r['customer']).strip()
-        lk   = f"atrisk_{cid}"
-        e    = log.get(lk, {}); it = e.get('targeted', False)
-        acct = str(r.get('acct', '')).split('.')[0] if pd.notna(r.get('acct','')) else ''
-        lp   = str(r.get('last_purchase',''))[:10] if pd.notna(r.get('last_purchase','')) else ''
-
-        if it: st.markdown('<div class="tgt-bg">', unsafe_allow_html=True)
-        cols = st.columns(WS)
-        with cols[0]:
-            nt = st.checkbox("", value=it, key=f"t_{lk}", label_visibility="collapsed")
-        with cols[1]:
-            st.markdown(f'<div class="cname">{cid}</div>', unsafe_allow_html=True)
-            if acct: st.markdown(f'<div class="csub">Acct {acct}</div>', unsafe_allow_html=True)
-        with cols[2]:
-            st.markdown(f'<div class="cval">{fmt_rev(r.get("decline_amount",0))}</div>', unsafe_allow_html=True)
-        with cols[3]:
-            st.markdown(f'<div class="cval">{fmt_mo(r.get("months_gone",0))} mo</div>', unsafe_allow_html=True)
-        with cols[4]:
-            st.markdown(f'<div class="cval">{lp}</div>', unsafe_allow_html=True)
-        if it: st.markdown('</div>', unsafe_allow_html=True)
-
-        if nt != it:
-            target_toggle(lk, nt, cid, dbr); st.rerun()
-        st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
+    shown = flagged_first(f, '_tg', 150)
+    ids   = shown['_name'].tolist()
+    view  = pd.DataFrame({
+        'Customer':      ids,
+        'Acct':          shown['_acct'].tolist(),
+        '3-Yr Revenue':  shown['_dec'].tolist(),
+        'Months Inactive': shown['_mo'].tolist(),
+        'Last Purchase': shown['_lp'].tolist()})
+    target_editor(view, ids, 'atrisk', dbr, 'ed_ar_browse')
 
 # =============================================================================
 # AT RISK — TARGET LIST
 # =============================================================================
 
 def show_atrisk_list():
-    df = load_at_risk(); dbr = gbn(); log = st.session_state.call_log
+    dbr = gbn(); log = st.session_state.call_log
 
-    f = df[df['branch'] == dbr].copy() if not df.empty else pd.DataFrame()
-    f['_tg'] = f['customer'].apply(lambda x: log.get(f"atrisk_{x}", {}).get('targeted', False))
-    f['_cd'] = f['customer'].apply(lambda x: log.get(f"atrisk_{x}", {}).get('called',   False))
-    targets  = f[f['_tg']].sort_values(['_cd','months_gone'], ascending=[False, True])
+    f = branch_slice('atrisk', dbr, file_mtime('atrisk'))
+    f = with_flags(f, '_name', 'atrisk', log)
+    targets  = f[f['_tg']].sort_values('_cd', ascending=False, kind='stable')
 
     tg_ct = len(targets); cd_ct = int(targets['_cd'].sum()) if tg_ct > 0 else 0
     hbar("At Risk — My Target List", f"{dbr} | {cd_ct}/{tg_ct} called |")
 
-    c1, _, c2 = st.columns([1.2, 3, 1])
+    c1, cm, c2 = st.columns([1.2, 3, 1])
     with c1: back_btn('atrisk', 'back_ar_list')
+    with cm: sync_btn('sync_ar')
     with c2:
         if st.button("+ Add More", key="ar_add"): go('atrisk'); st.rerun()
 
@@ -539,54 +907,34 @@ def show_atrisk_list():
     with c1: hide_cd = st.checkbox("Hide called", key="hc_ar")
     with c2: search  = st.text_input("", placeholder="Search...", key="s_ar_list",
                                       label_visibility="collapsed")
-    if search:  targets = targets[targets['customer'].str.contains(search, case=False, na=False)]
+    if search:  targets = targets[targets['_name_l'].str.contains(search.lower(), na=False, regex=False)]
     if hide_cd: targets = targets[~targets['_cd']]
     st.caption(f"{len(targets)} targeted | {cd_ct} called")
 
-    WS = [0.45, 0.45, 2.8, 1.2, 1.0, 1.0, 2.2]
-    col_heads(WS, ['CALLED', 'F/U', 'CUSTOMER', '3-YR REV', '2024 REV', 'MONTHS', 'NOTES'])
-
-    for _, r in targets.iterrows():
-        cid  = str(r['customer']).strip(); lk = f"atrisk_{cid}"
-        e    = log.get(lk, {})
-        ic   = e.get('called', False); ifu = e.get('followup', False); sn = e.get('notes', '')
-        acct = str(r.get('acct','')).split('.')[0] if pd.notna(r.get('acct','')) else ''
-        lp   = str(r.get('last_purchase',''))[:10] if pd.notna(r.get('last_purchase','')) else ''
-
-        cols = st.columns(WS)
-        with cols[0]: nc  = st.checkbox("", value=ic,  key=f"c_{lk}", label_visibility="collapsed")
-        with cols[1]: nfu = st.checkbox("", value=ifu, key=f"f_{lk}", label_visibility="collapsed")
-        with cols[2]:
-            st.markdown(f'<div class="cname">{cid}</div>', unsafe_allow_html=True)
-            if acct: st.markdown(f'<div class="csub">Acct {acct} · Last: {lp}</div>', unsafe_allow_html=True)
-        with cols[3]: st.markdown(f'<div class="cval">{fmt_rev(r.get("decline_amount",0))}</div>', unsafe_allow_html=True)
-        with cols[4]: st.markdown(f'<div class="cval">{fmt_rev(r.get("rev_2024",0))}</div>', unsafe_allow_html=True)
-        with cols[5]: st.markdown(f'<div class="cval">{fmt_mo(r.get("months_gone",0))} mo</div>', unsafe_allow_html=True)
-        with cols[6]: nn = st.text_input("", value=sn, key=f"n_{lk}",
-                                          label_visibility="collapsed", placeholder="Notes...")
-
-        if nc != ic or nfu != ifu or nn != sn:
-            e.update({'called': nc, 'followup': nfu, 'notes': nn, 'targeted': True,
-                      'customer_name': cid, 'branch_name': dbr,
-                      'user': gun(), 'date_updated': datetime.now().strftime('%Y-%m-%d %H:%M')})
-            save_entry(lk, e)
-            if nc != ic: st.rerun()
-        st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
+    ids  = targets['_name'].tolist()
+    view = pd.DataFrame({
+        'Customer':      ids,
+        'Acct':          targets['_acct'].tolist(),
+        '3-Yr Rev':      targets['_dec'].tolist(),
+        '2024 Rev':      targets['_r24'].tolist(),
+        'Months':        targets['_mo'].tolist(),
+        'Last Purchase': targets['_lp'].tolist()})
+    call_editor(view, ids, 'atrisk', dbr, 'ed_ar')
 
 # =============================================================================
 # RECOVERY — BROWSE
 # =============================================================================
 
 def show_recovery_browse():
-    df = load_recovery()
-    if df.empty:
+    branches = campaign_branches('recovery', file_mtime('recovery'))
+    if not branches:
         st.error("No recovery data."); back_btn('cards', 'back_rec_empty'); return
 
     dbr = gbn(); log = st.session_state.call_log
 
     c1, c2, c3, c4 = st.columns([2, 2, 2.5, 0.8])
     with c1:
-        opts = ["All Branches"] + sorted(df['branch'].dropna().unique().tolist())
+        opts = ["All Branches"] + branches
         sel  = st.selectbox("Branch", opts, index=opts.index(dbr) if dbr in opts else 0,
                              key="br_rec", label_visibility="collapsed")
         if sel != "All Branches": dbr = sel
@@ -599,16 +947,15 @@ def show_recovery_browse():
     with c4:
         back_btn('cards', 'back_rec')
 
-    f = df[df['branch'] == dbr].copy()
+    br_all = branch_slice('recovery', dbr, file_mtime('recovery'))
+    f = br_all
     if filt == "13–18 months": f = f[f['months_gone'] <= 18]
     elif filt == "19–30 months": f = f[f['months_gone'] > 18]
-    if search: f = f[f['customer'].str.contains(search, case=False, na=False)]
+    if search: f = f[f['_name_l'].str.contains(search.lower(), na=False, regex=False)]
 
-    f['_tg'] = f['customer'].apply(lambda x: log.get(f"recovery_{x}", {}).get('targeted', False))
-    f = f.sort_values(['_tg','decline_amount'], ascending=[False, False])
+    f = with_flags(f, '_name', 'recovery', log)
 
     tg_ct   = int(f['_tg'].sum())
-    br_all  = df[df['branch'] == dbr]
     recent  = len(br_all[br_all['months_gone'] <= 18])
 
     hbar("Recovery — Browse", f"{dbr} |")
@@ -627,53 +974,36 @@ def show_recovery_browse():
         if st.button(lbl, use_container_width=True,
                      type="primary" if tg_ct > 0 else "secondary", key="goto_rec_list"):
             go('recovery_list'); st.rerun()
+        sync_btn('sync_rec_browse')
 
     st.caption(f"{len(f)} shown")
-    WS = [0.4, 2.8, 1.3, 1.1, 1.3]
-    col_heads(WS, ['SELECT', 'CUSTOMER', '3-YR REVENUE', 'MONTHS GONE', 'LAST PURCHASE'])
-
-    for _, r in f.head(150).iterrows():
-        cid  = str(r['customer']).strip(); lk = f"recovery_{cid}"
-        e    = log.get(lk, {}); it = e.get('targeted', False)
-        acct = str(r.get('acct','')).split('.')[0] if pd.notna(r.get('acct','')) else ''
-        lp   = str(r.get('last_purchase',''))[:10] if pd.notna(r.get('last_purchase','')) else ''
-
-        if it: st.markdown('<div class="tgt-bg">', unsafe_allow_html=True)
-        cols = st.columns(WS)
-        with cols[0]:
-            nt = st.checkbox("", value=it, key=f"t_{lk}", label_visibility="collapsed")
-        with cols[1]:
-            st.markdown(f'<div class="cname">{cid}</div>', unsafe_allow_html=True)
-            if acct: st.markdown(f'<div class="csub">Acct {acct}</div>', unsafe_allow_html=True)
-        with cols[2]:
-            st.markdown(f'<div class="cval">{fmt_rev(r.get("decline_amount",0))}</div>', unsafe_allow_html=True)
-        with cols[3]:
-            st.markdown(f'<div class="cval">{fmt_mo(r.get("months_gone",0))} mo</div>', unsafe_allow_html=True)
-        with cols[4]:
-            st.markdown(f'<div class="cval">{lp}</div>', unsafe_allow_html=True)
-        if it: st.markdown('</div>', unsafe_allow_html=True)
-
-        if nt != it:
-            target_toggle(lk, nt, cid, dbr); st.rerun()
-        st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
+    shown = flagged_first(f, '_tg', 150)
+    ids   = shown['_name'].tolist()
+    view  = pd.DataFrame({
+        'Customer':      ids,
+        'Acct':          shown['_acct'].tolist(),
+        '3-Yr Revenue':  shown['_dec'].tolist(),
+        'Months Gone':   shown['_mo'].tolist(),
+        'Last Purchase': shown['_lp'].tolist()})
+    target_editor(view, ids, 'recovery', dbr, 'ed_rec_browse')
 
 # =============================================================================
 # RECOVERY — TARGET LIST
 # =============================================================================
 
 def show_recovery_list():
-    df = load_recovery(); dbr = gbn(); log = st.session_state.call_log
+    dbr = gbn(); log = st.session_state.call_log
 
-    f = df[df['branch'] == dbr].copy() if not df.empty else pd.DataFrame()
-    f['_tg'] = f['customer'].apply(lambda x: log.get(f"recovery_{x}", {}).get('targeted', False))
-    f['_cd'] = f['customer'].apply(lambda x: log.get(f"recovery_{x}", {}).get('called',   False))
-    targets  = f[f['_tg']].sort_values(['_cd','decline_amount'], ascending=[False, False])
+    f = branch_slice('recovery', dbr, file_mtime('recovery'))
+    f = with_flags(f, '_name', 'recovery', log)
+    targets  = f[f['_tg']].sort_values('_cd', ascending=False, kind='stable')
 
     tg_ct = len(targets); cd_ct = int(targets['_cd'].sum()) if tg_ct > 0 else 0
     hbar("Recovery — My Target List", f"{dbr} | {cd_ct}/{tg_ct} called |")
 
-    c1, _, c2 = st.columns([1.2, 3, 1])
+    c1, cm, c2 = st.columns([1.2, 3, 1])
     with c1: back_btn('recovery', 'back_rec_list')
+    with cm: sync_btn('sync_rec')
     with c2:
         if st.button("+ Add More", key="rec_add"): go('recovery'); st.rerun()
 
@@ -687,54 +1017,34 @@ def show_recovery_list():
     with c1: hide_cd = st.checkbox("Hide called", key="hc_rec")
     with c2: search  = st.text_input("", placeholder="Search...", key="s_rec_list",
                                       label_visibility="collapsed")
-    if search:  targets = targets[targets['customer'].str.contains(search, case=False, na=False)]
+    if search:  targets = targets[targets['_name_l'].str.contains(search.lower(), na=False, regex=False)]
     if hide_cd: targets = targets[~targets['_cd']]
     st.caption(f"{len(targets)} targeted | {cd_ct} called")
 
-    WS = [0.45, 0.45, 2.8, 1.2, 1.0, 1.0, 2.2]
-    col_heads(WS, ['CALLED', 'F/U', 'CUSTOMER', '3-YR REV', '2024 REV', 'MONTHS', 'NOTES'])
-
-    for _, r in targets.iterrows():
-        cid  = str(r['customer']).strip(); lk = f"recovery_{cid}"
-        e    = log.get(lk, {})
-        ic   = e.get('called', False); ifu = e.get('followup', False); sn = e.get('notes', '')
-        acct = str(r.get('acct','')).split('.')[0] if pd.notna(r.get('acct','')) else ''
-        lp   = str(r.get('last_purchase',''))[:10] if pd.notna(r.get('last_purchase','')) else ''
-
-        cols = st.columns(WS)
-        with cols[0]: nc  = st.checkbox("", value=ic,  key=f"c_{lk}", label_visibility="collapsed")
-        with cols[1]: nfu = st.checkbox("", value=ifu, key=f"f_{lk}", label_visibility="collapsed")
-        with cols[2]:
-            st.markdown(f'<div class="cname">{cid}</div>', unsafe_allow_html=True)
-            if acct: st.markdown(f'<div class="csub">Acct {acct} · Last: {lp}</div>', unsafe_allow_html=True)
-        with cols[3]: st.markdown(f'<div class="cval">{fmt_rev(r.get("decline_amount",0))}</div>', unsafe_allow_html=True)
-        with cols[4]: st.markdown(f'<div class="cval">{fmt_rev(r.get("rev_2024",0))}</div>', unsafe_allow_html=True)
-        with cols[5]: st.markdown(f'<div class="cval">{fmt_mo(r.get("months_gone",0))} mo</div>', unsafe_allow_html=True)
-        with cols[6]: nn = st.text_input("", value=sn, key=f"n_{lk}",
-                                          label_visibility="collapsed", placeholder="Notes...")
-
-        if nc != ic or nfu != ifu or nn != sn:
-            e.update({'called': nc, 'followup': nfu, 'notes': nn, 'targeted': True,
-                      'customer_name': cid, 'branch_name': dbr,
-                      'user': gun(), 'date_updated': datetime.now().strftime('%Y-%m-%d %H:%M')})
-            save_entry(lk, e)
-            if nc != ic: st.rerun()
-        st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
+    ids  = targets['_name'].tolist()
+    view = pd.DataFrame({
+        'Customer':      ids,
+        'Acct':          targets['_acct'].tolist(),
+        '3-Yr Rev':      targets['_dec'].tolist(),
+        '2024 Rev':      targets['_r24'].tolist(),
+        'Months':        targets['_mo'].tolist(),
+        'Last Purchase': targets['_lp'].tolist()})
+    call_editor(view, ids, 'recovery', dbr, 'ed_rec')
 
 # =============================================================================
 # CONQUEST — BROWSE
 # =============================================================================
 
 def show_conquest_browse():
-    df = load_conquest()
-    if df.empty:
+    branches = campaign_branches('conquest', file_mtime('conquest'))
+    if not branches:
         st.error("No conquest data."); back_btn('cards', 'back_cq_empty'); return
 
     dbr = gbn(); log = st.session_state.call_log
 
     c1, c2, c3, c4 = st.columns([2, 2, 2.5, 0.8])
     with c1:
-        opts = ["All Branches"] + sorted(df['branch'].dropna().unique().tolist())
+        opts = ["All Branches"] + branches
         sel  = st.selectbox("Branch", opts, index=opts.index(dbr) if dbr in opts else 0,
                              key="br_cq", label_visibility="collapsed")
         if sel != "All Branches": dbr = sel
@@ -747,17 +1057,16 @@ def show_conquest_browse():
     with c4:
         back_btn('cards', 'back_cq')
 
-    f = df[df['branch'] == dbr].copy()
+    br_all = branch_slice('conquest', dbr, file_mtime('conquest'))
+    f = br_all
     if filt == "Tier 1 & 2":  f = f[f['tier'] <= 2]
     elif filt == "SE History": f = f[f['sn_match'] == True]
     elif filt == "Tier 3 & 4": f = f[f['tier'] >= 3]
-    if search: f = f[f['company'].str.contains(search, case=False, na=False)]
+    if search: f = f[f['_name_l'].str.contains(search.lower(), na=False, regex=False)]
 
-    f['_tg'] = f['company'].apply(lambda x: log.get(f"conquest_{x}", {}).get('targeted', False))
-    f = f.sort_values(['_tg','tier','score'], ascending=[False, True, False])
+    f = with_flags(f, '_name', 'conquest', log)
 
     tg_ct = int(f['_tg'].sum())
-    br_all = df[df['branch'] == dbr]
     t12    = len(br_all[br_all['tier'] <= 2])
 
     hbar("Conquest — Browse", f"{dbr} |")
@@ -776,63 +1085,37 @@ def show_conquest_browse():
         if st.button(lbl, use_container_width=True,
                      type="primary" if tg_ct > 0 else "secondary", key="goto_cq_list"):
             go('conquest_list'); st.rerun()
+        sync_btn('sync_cq_browse')
 
     st.caption(f"{len(f)} shown")
-    WS = [0.4, 0.55, 2.8, 1.9, 0.75, 1.1]
-    col_heads(WS, ['SELECT', 'TIER', 'COMPANY', 'MAKES / UNITS', 'SCORE', 'SE HISTORY'])
-
-    for _, r in f.head(150).iterrows():
-        cid   = str(r['company']).strip(); lk = f"conquest_{cid}"
-        e     = log.get(lk, {}); it = e.get('targeted', False)
-        tier  = int(r.get('tier', 4))
-        score = int(r.get('score', 0)) if pd.notna(r.get('score')) else 0
-        makes = str(r.get('makes','')).strip(); makes = makes if makes and makes != 'nan' else ''
-        units = int(r['units']) if pd.notna(r.get('units')) else 0
-        equip = f"{makes} · {units} units" if makes else f"{units} units"
-        city  = str(r.get('city','')).strip(); state = str(r.get('state','')).strip()
-        loc   = f"{city}, {state}" if city and city!='nan' and state and state!='nan' else ''
-        hr    = r.get('hist_revenue', 0)
-        se_h  = fmt_rev(hr) if pd.notna(hr) and float(hr) > 0 else '—'
-        tlbl, tcls = TIER_LABELS.get(tier, ('T4','b-gray'))
-
-        if it: st.markdown('<div class="tgt-bg">', unsafe_allow_html=True)
-        cols = st.columns(WS)
-        with cols[0]:
-            nt = st.checkbox("", value=it, key=f"t_{lk}", label_visibility="collapsed")
-        with cols[1]:
-            st.markdown(f'<span class="badge {tcls}">{tlbl}</span>', unsafe_allow_html=True)
-        with cols[2]:
-            st.markdown(f'<div class="cname">{cid}</div>', unsafe_allow_html=True)
-            if loc: st.markdown(f'<div class="csub">{loc}</div>', unsafe_allow_html=True)
-        with cols[3]:
-            st.markdown(f'<div class="cval">{equip}</div>', unsafe_allow_html=True)
-        with cols[4]:
-            st.markdown(f'<div class="cval">{score}</div>', unsafe_allow_html=True)
-        with cols[5]:
-            st.markdown(f'<div class="cval">{se_h}</div>', unsafe_allow_html=True)
-        if it: st.markdown('</div>', unsafe_allow_html=True)
-
-        if nt != it:
-            target_toggle(lk, nt, cid, dbr); st.rerun()
-        st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
+    shown = flagged_first(f, '_tg', 150)
+    ids   = shown['_name'].tolist()
+    view  = pd.DataFrame({
+        'Tier':          shown['_tier_lbl'].tolist(),
+        'Company':       ids,
+        'Location':      shown['_loc'].tolist(),
+        'Makes / Units': shown['_equip'].tolist(),
+        'Score':         shown['_score'].tolist(),
+        'SE History':    shown['_se_h'].tolist()})
+    target_editor(view, ids, 'conquest', dbr, 'ed_cq_browse')
 
 # =============================================================================
 # CONQUEST — TARGET LIST
 # =============================================================================
 
 def show_conquest_list():
-    df = load_conquest(); dbr = gbn(); log = st.session_state.call_log
+    dbr = gbn(); log = st.session_state.call_log
 
-    f = df[df['branch'] == dbr].copy() if not df.empty else pd.DataFrame()
-    f['_tg'] = f['company'].apply(lambda x: log.get(f"conquest_{x}", {}).get('targeted', False))
-    f['_cd'] = f['company'].apply(lambda x: log.get(f"conquest_{x}", {}).get('called',   False))
-    targets  = f[f['_tg']].sort_values(['_cd','tier','score'], ascending=[False, True, False])
+    f = branch_slice('conquest', dbr, file_mtime('conquest'))
+    f = with_flags(f, '_name', 'conquest', log)
+    targets  = f[f['_tg']].sort_values('_cd', ascending=False, kind='stable')
 
     tg_ct = len(targets); cd_ct = int(targets['_cd'].sum()) if tg_ct > 0 else 0
     hbar("Conquest — My Target List", f"{dbr} | {cd_ct}/{tg_ct} called |")
 
-    c1, _, c2 = st.columns([1.2, 3, 1])
+    c1, cm, c2 = st.columns([1.2, 3, 1])
     with c1: back_btn('conquest', 'back_cq_list')
+    with cm: sync_btn('sync_cq')
     with c2:
         if st.button("+ Add More", key="cq_add"): go('conquest'); st.rerun()
 
@@ -846,51 +1129,17 @@ def show_conquest_list():
     with c1: hide_cd = st.checkbox("Hide called", key="hc_cq")
     with c2: search  = st.text_input("", placeholder="Search...", key="s_cq_list",
                                       label_visibility="collapsed")
-    if search:  targets = targets[targets['company'].str.contains(search, case=False, na=False)]
+    if search:  targets = targets[targets['_name_l'].str.contains(search.lower(), na=False, regex=False)]
     if hide_cd: targets = targets[~targets['_cd']]
     st.caption(f"{len(targets)} targeted | {cd_ct} called")
 
-    WS = [0.45, 0.45, 0.55, 2.8, 1.6, 1.0, 2.2]
-    col_heads(WS, ['CALLED', 'F/U', 'TIER', 'COMPANY', 'MAKES / UNITS', 'SE HISTORY', 'NOTES'])
-
-    for _, r in targets.iterrows():
-        cid   = str(r['company']).strip(); lk = f"conquest_{cid}"
-        e     = log.get(lk, {})
-        ic    = e.get('called', False); ifu = e.get('followup', False); sn = e.get('notes', '')
-        tier  = int(r.get('tier', 4))
-        makes = str(r.get('makes','')).strip(); makes = makes if makes and makes != 'nan' else ''
-        units = int(r['units']) if pd.notna(r.get('units')) else 0
-        equip = f"{makes} · {units} units" if makes else f"{units} units"
-        ph    = str(r.get('phone','')).strip()
-        ph    = ph if len(ph) >= 7 and ph not in ('nan','0','0.0') else ''
-        ct    = str(r.get('contact','')).strip()
-        ct    = ct if ct and ct not in ('nan nan','nan','') else ''
-        city  = str(r.get('city','')).strip(); state = str(r.get('state','')).strip()
-        loc   = f"{city}, {state}" if city and city!='nan' and state and state!='nan' else ''
-        sub   = " | ".join([s for s in [ct, ph, loc] if s][:2])
-        hr    = r.get('hist_revenue', 0)
-        se_h  = fmt_rev(hr) if pd.notna(hr) and float(hr) > 0 else '—'
-        tlbl, tcls = TIER_LABELS.get(tier, ('T4','b-gray'))
-
-        cols = st.columns(WS)
-        with cols[0]: nc  = st.checkbox("", value=ic,  key=f"c_{lk}", label_visibility="collapsed")
-        with cols[1]: nfu = st.checkbox("", value=ifu, key=f"f_{lk}", label_visibility="collapsed")
-        with cols[2]: st.markdown(f'<span class="badge {tcls}">{tlbl}</span>', unsafe_allow_html=True)
-        with cols[3]:
-            st.markdown(f'<div class="cname">{cid}</div>', unsafe_allow_html=True)
-            if sub: st.markdown(f'<div class="csub">{sub}</div>', unsafe_allow_html=True)
-        with cols[4]: st.markdown(f'<div class="cval">{equip}</div>', unsafe_allow_html=True)
-        with cols[5]: st.markdown(f'<div class="cval">{se_h}</div>', unsafe_allow_html=True)
-        with cols[6]: nn = st.text_input("", value=sn, key=f"n_{lk}",
-                                          label_visibility="collapsed", placeholder="Notes...")
-
-        if nc != ic or nfu != ifu or nn != sn:
-            e.update({'called': nc, 'followup': nfu, 'notes': nn, 'targeted': True,
-                      'customer_name': cid, 'branch_name': dbr,
-                      'user': gun(), 'date_updated': datetime.now().strftime('%Y-%m-%d %H:%M')})
-            save_entry(lk, e)
-            if nc != ic: st.rerun()
-        st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
+    grid = pd.DataFrame({
+        'Tier':          targets['_tier_lbl'].tolist(),
+        'Company':       targets['_name'].tolist(),
+        'Contact':       targets['_sub'].tolist(),
+        'Makes / Units': targets['_equip'].tolist(),
+        'SE History':    targets['_se_h'].tolist()})
+    call_editor(grid, grid['Company'].tolist(), 'conquest', dbr, 'ed_cq')
 
 # =============================================================================
 # ADMIN
@@ -902,12 +1151,8 @@ def show_admin():
     log = st.session_state.call_log
     if not log:
         st.info("No entries yet."); return
-    rows = [{'key': k, 'customer': e.get('customer_name',''), 'branch': e.get('branch_name',''),
-             'targeted': e.get('targeted',False), 'called': e.get('called',False),
-             'followup': e.get('followup',False), 'notes': e.get('notes',''),
-             'user': e.get('user',''), 'date': e.get('date_updated','')}
-            for k, e in log.items()]
-    adf = pd.DataFrame(rows)
+
+    adf = call_log_df()[list(ADMIN_COLS)].rename(columns=ADMIN_COLS)
     st.dataframe(adf, use_container_width=True)
     st.download_button("Download", adf.to_csv(index=False),
                         f"outreach_log_{datetime.now().strftime('%Y%m%d')}.csv", "text/csv")
@@ -916,16 +1161,19 @@ def show_admin():
 # ROUTER
 # =============================================================================
 
-page = st.session_state.page
+ROUTER = {
+    'login':         show_login,
+    'cards':         show_cards,
+    'atrisk':        show_atrisk_browse,
+    'atrisk_list':   show_atrisk_list,
+    'recovery':      show_recovery_browse,
+    'recovery_list': show_recovery_list,
+    'conquest':      show_conquest_browse,
+    'conquest_list': show_conquest_list,
+    'admin':         show_admin,
+}
 
-if   page == 'login':         show_login()
-elif page == 'cards':         show_cards()
-elif page == 'atrisk':        show_atrisk_browse()
-elif page == 'atrisk_list':   show_atrisk_list()
-elif page == 'recovery':      show_recovery_browse()
-elif page == 'recovery_list': show_recovery_list()
-elif page == 'conquest':      show_conquest_browse()
-elif page == 'conquest_list': show_conquest_list()
-elif page == 'admin':         show_admin()
+render = ROUTER.get(st.session_state.page)
+if render: render()
 else:
     go('login'); st.rerun()